@@ -349,9 +349,8 @@ mutation ($repositoryId: ID!, $base: String!, $head: String!) {
 
 
 async def get_username(hostname: str) -> Result[str]:
-    """Returns the username associated with the auth token. Note that it is
-    slightly faster to call graphql.try_parse_oath_token_from_hosts_yml() and
-    read the value from hosts.yml.
+    """Returns the username associated with the auth token used by the gh CLI
+    for the specified hostname.
     """
     query = """
 query {
@@ -14,6 +14,11 @@ from edenscm.i18n import _
 from edenscm.result import Err, Ok, Result
 
 
+_GITHUB_URL_PATTERN = re.compile(
+    r"(?:https://([^/]+)|(?:git\+ssh://|ssh://)?git@([^:/]+))[:/]([^/]+)\/(.+?)(?:\.git)?$"
+)
+
+
 class NotGitHubRepoError:
     # we can add a 'kind' enum attribute to differentiate 'Not Git' and
     # 'Git but not GitHub' cases later if needed
@@ -147,8 +152,7 @@ def parse_github_repo_from_github_url(url: str) -> Optional[GitHubRepo]:
     >>> parse_github_repo_from_github_url("git+ssh://git@foo.bar.com:bolinfest/escoria-demo-game.git").to_url()
     'https://foo.bar.com/bolinfest/escoria-demo-game'
     """
-    pattern = r"(?:https://([^/]+)|(?:git\+ssh://|ssh://)?git@([^:/]+))[:/]([^/]+)\/(.+?)(?:\.git)?$"
-    match = re.match(pattern, url)
+    match = _GITHUB_URL_PATTERN.match(url)
     if match:
         hostname1, hostname2, owner, repo = match.groups()
         return GitHubRepo(hostname1 or hostname2, owner, repo)
@@ -15,46 +15,58 @@ from ghstack.github_gh_cli import make_request
 from .pullrequest import GraphQLPullRequest, PullRequestId
 
 
-PULL_REQUEST_QUERY = """
-query PullRequestQuery($owner: String!, $name: String!, $number: Int!) {
-  repository(name: $name, owner: $owner) {
-    pullRequest(number: $number) {
-      id
-      number
-      url
-      title
-      body
-
-      isDraft
-      state
-      closed
-      merged
-      reviewDecision
-
-      commits(last: 1) {
-        nodes {
-          commit {
-            statusCheckRollup {
-              state
-            }
-          }
+_PULL_REQUEST_FIELDS = """
+fragment PullRequestFields on PullRequest {
+  id
+  number
+  url
+  title
+  body
+
+  isDraft
+  state
+  closed
+  merged
+  reviewDecision
+
+  commits(last: 1) {
+    nodes {
+      commit {
+        statusCheckRollup {
+          state
         }
       }
+    }
+  }
 
-      baseRefName
-      baseRefOid
-      baseRepository {
-        nameWithOwner
-      }
-      headRefName
-      headRefOid
-      headRepository {
-        nameWithOwner
-      }
+  baseRefName
+  baseRefOid
+  baseRepository {
+    nameWithOwner
+  }
+  headRefName
+  headRefOid
+  headRepository {
+    nameWithOwner
+  }
+}
+"""
+
+PULL_REQUEST_QUERY = (
+    """
+query PullRequestQuery($owner: String!, $name: String!, $number: Int!) {
+  repository(name: $name, owner: $owner) {
+    pullRequest(number: $number) {
+      ...PullRequestFields
     }
   }
 }
 """
+    + _PULL_REQUEST_FIELDS
+)
+
+# Maximum number of pull requests fetched by a single aliased GraphQL query.
+_BATCH_SIZE = 32
 
 
 def get_pull_request_data(pr: PullRequestId) -> Optional[GraphQLPullRequest]:
@@ -72,6 +84,40 @@ def get_pull_request_data(pr: PullRequestId) -> Optional[GraphQLPullRequest]:
 def get_pull_request_data_list(
     github: GitHubEndpoint,
     pr_list: Iterable[PullRequestId],
+) -> List[Optional[GraphQLPullRequest]]:
+    """Fetch the data for each PR in pr_list, in order, using one request per
+    _BATCH_SIZE pull requests rather than one request per pull request.
+    """
+    pr_list = list(pr_list)
+    if len(pr_list) <= 1:
+        return _get_pull_request_data_list_unbatched(github, pr_list)
+
+    batches = [
+        pr_list[i : i + _BATCH_SIZE] for i in range(0, len(pr_list), _BATCH_SIZE)
+    ]
+    requests = [
+        github.graphql(_batched_query(len(batch)), **_generate_batched_params(batch))
+        for batch in batches
+    ]
+    loop = asyncio.get_event_loop()
+    responses = loop.run_until_complete(asyncio.gather(*requests))
+    result = []
+    for batch, resp in zip(batches, responses):
+        if resp.is_error():
+            # A single missing or inaccessible PR fails the whole batch, so
+            # fetch the PRs in this batch individually to find out which.
+            result.extend(_get_pull_request_data_list_unbatched(github, batch))
+        else:
+            data = resp.ok["data"]
+            for i in range(len(batch)):
+                pr_data = data[f"pr{i}"]["pullRequest"]
+                result.append(GraphQLPullRequest(pr_data))
+    return result
+
+
+def _get_pull_request_data_list_unbatched(
+    github: GitHubEndpoint,
+    pr_list: Iterable[PullRequestId],
 ) -> List[Optional[GraphQLPullRequest]]:
     requests = [
         github.graphql(PULL_REQUEST_QUERY, **_generate_params(pr)) for pr in pr_list
@@ -88,6 +134,40 @@ def get_pull_request_data_list(
     return result
 
 
+def _batched_query(size: int) -> str:
+    """Returns a query that fetches `size` pull requests, aliased as pr0, pr1,
+    etc., whose variables are generated by _generate_batched_params().
+
+    >>> print(_batched_query(2).split("fragment")[0].strip())
+    query PullRequestsQuery($owner0: String!, $name0: String!, $number0: Int!, $owner1: String!, $name1: String!, $number1: Int!) {
+      pr0: repository(name: $name0, owner: $owner0) { pullRequest(number: $number0) { ...PullRequestFields } }
+      pr1: repository(name: $name1, owner: $owner1) { pullRequest(number: $number1) { ...PullRequestFields } }
+    }
+    """
+    variables = ", ".join(
+        f"$owner{i}: String!, $name{i}: String!, $number{i}: Int!"
+        for i in range(size)
+    )
+    fields = "".join(
+        f"  pr{i}: repository(name: $name{i}, owner: $owner{i}) "
+        f"{{ pullRequest(number: $number{i}) {{ ...PullRequestFields }} }}\n"
+        for i in range(size)
+    )
+    return (
+        f"query PullRequestsQuery({variables}) {{\n{fields}}}\n" + _PULL_REQUEST_FIELDS
+    )
+
+
+def _generate_batched_params(
+    pr_list: List[PullRequestId],
+) -> Dict[str, Union[str, int, bool]]:
+    params = {}
+    for i, pr in enumerate(pr_list):
+        for key, value in _generate_params(pr).items():
+            params[f"{key}{i}"] = value
+    return params
+
+
 def _generate_params(pr: PullRequestId) -> Dict[str, Union[str, int, bool]]:
     return {
         "owner": pr.owner,
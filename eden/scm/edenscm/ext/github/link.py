@@ -14,6 +14,11 @@ from .pullrequest import PullRequestId
 
 from .pullrequeststore import PullRequestStore
 
+_INT_PATTERN = re.compile(r"^[1-9][0-9]+$")
+_PULL_REQUEST_URL_PATTERN = re.compile(
+    r"^https://([^/]*)/([^/]+)/([^/]+)/pull/([1-9][0-9]+)$"
+)
+
 
 def link(ui, repo, *args, **opts):
     if len(args) != 1:
@@ -50,15 +55,13 @@ def resolve_pr_arg(pr_arg: str, ui) -> Optional[PullRequestId]:
 
 def try_parse_int(s: str) -> Optional[int]:
     """tries to parse s as a positive integer"""
-    pattern = r"^[1-9][0-9]+$"
-    match = re.match(pattern, s)
+    match = _INT_PATTERN.match(s)
     return int(match[0]) if match else None
 
 
 def try_parse_pull_request_url(url: str) -> Optional[PullRequestId]:
     """parses the url into a PullRequest if it is in the expected format"""
-    pattern = r"^https://([^/]*)/([^/]+)/([^/]+)/pull/([1-9][0-9]+)$"
-    match = re.match(pattern, url)
+    match = _PULL_REQUEST_URL_PATTERN.match(url)
     if match:
         hostname, owner, name, number = match.groups()
         return PullRequestId(
@@ -3,12 +3,13 @@
 # This software may be used and distributed according to the terms of the
 # GNU General Public License version 2.
 
-import re
 from typing import Optional
 
 from .pullrequest import PullRequestId
 from .pullrequeststore import PullRequestStore
 
+_PULL_REQUEST_RESOLVED_PREFIX = "Pull Request resolved: https://"
+
 
 def get_pull_request_for_context(
     store: PullRequestStore,
@@ -36,12 +37,22 @@ def _parse_github_pull_request_url(descr: str) -> Optional[PullRequestId]:
     """
     # This is the format used by ghstack, though other variants may be supported
     # in the future.
-    match = re.search(
-        r"^Pull Request resolved: https://([^/]*)/([^/]*)/([^/]*)/pull/([1-9][0-9]*)$",
-        descr,
-        re.MULTILINE,
-    )
-    if not match:
-        return None
-    hostname, owner, name, number = match.groups()
-    return PullRequestId(hostname=hostname, owner=owner, name=name, number=int(number))
+    # Most commit messages do not reference a pull request, so rather than
+    # splitting descr into lines, jump straight to each occurrence of the
+    # prefix and only look at the remainder of that line.
+    prefix_len = len(_PULL_REQUEST_RESOLVED_PREFIX)
+    start = descr.find(_PULL_REQUEST_RESOLVED_PREFIX)
+    while start != -1:
+        end = descr.find("\n", start)
+        if end == -1:
+            end = len(descr)
+        if start == 0 or descr[start - 1] == "\n":
+            parts = descr[start + prefix_len : end].split("/")
+            if len(parts) == 5 and parts[3] == "pull":
+                hostname, owner, name, _pull, number = parts
+                if number.isascii() and number.isdigit() and number[0] != "0":
+                    return PullRequestId(
+                        hostname=hostname, owner=owner, name=name, number=int(number)
+                    )
+        start = descr.find(_PULL_REQUEST_RESOLVED_PREFIX, end)
+    return None
@@ -4,6 +4,7 @@
 # GNU General Public License version 2.
 
 from dataclasses import dataclass
+from functools import cached_property
 from typing import Any, Dict, Optional, TypedDict
 
 from ghstack.github_cli_endpoint import GitHubCLIEndpoint
@@ -31,13 +32,36 @@ class PullRequestId:
     # Public-facing integer ID for the pull request.
     number: int
 
+    def __post_init__(self):
+        # PullRequestIds are frequently used as dict keys and set members, so
+        # compute the hash once rather than rebuilding the field tuple each time.
+        object.__setattr__(
+            self, "_hash", hash((self.hostname, self.owner, self.name, self.number))
+        )
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __reduce__(self):
+        # str hashes vary across processes, so do not pickle _hash.
+        return (PullRequestId, (self.hostname, self.owner, self.name, self.number))
+
     def as_url(self, domain=None) -> str:
         """domain is the hostname used to display the pull request. Note this
         is orthogonal to self.hostname.
         """
         # TODO: When ReviewStack supports GitHub Enterprise, this logic will
         # have to change.
-        domain = domain or self.get_hostname()
+        if not domain:
+            return self._default_url
+        return f"https://{domain}/{self.owner}/{self.name}/pull/{self.number}"
+
+    @cached_property
+    def _default_url(self) -> str:
+        """URL on self.hostname. The fields are frozen, so this is computed at
+        most once per instance.
+        """
+        domain = self.get_hostname()
         return f"https://{domain}/{self.owner}/{self.name}/pull/{self.number}"
 
     def as_dict(self) -> PullRequestIdDict:
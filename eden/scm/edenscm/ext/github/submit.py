@@ -470,19 +470,16 @@ async def add_pr_head_to_archives(
         # `git fetch --verbose` does not appear to include the hash, so we must
         # use `git ls-remote` to get it.
         ls_remote_args = ["ls-remote", origin, branch_name]
-        ls_remote_output = (
-            run_git_command(ls_remote_args, gitdir=gitdir).decode().rstrip()
-        )
-        # oid and ref name should be separated by a tab character, but we use
-        # '\s+' just to be safe.
-        match = re.match(r"^([0-9a-f]+)\s+.*$", ls_remote_output)
+        ls_remote_output = run_git_command(ls_remote_args, gitdir=gitdir).rstrip()
+        match = _LS_REMOTE_PATTERN.match(ls_remote_output)
         if not match:
             raise error.Abort(
                 _("unexpected output from `%s`: %s")
-                % (" ".join(ls_remote_args), ls_remote_output)
+                % (" ".join(ls_remote_args), ls_remote_output.decode())
             )
 
-        branch_name_oid = match[1]
+        # Only the oid, which is ASCII, needs to be decoded.
+        branch_name_oid = match[1].decode()
 
         # This will be the tree to use for the merge commit. We could use the
         # tree for either `tip` or `branch_name_oid`, but since `tip` appears to
@@ -677,7 +674,10 @@ def run_git_command(args: List[str], gitdir: str) -> bytes:
         )
 
 
-EOL_PATTERN = re.compile(r"\r?\n")
+# oid and ref name should be separated by a tab character, but we use '\s+'
+# just to be safe.
+_LS_REMOTE_PATTERN = re.compile(rb"^([0-9a-f]+)\s+.*$")
+
 MAX_FIRSTLINE_LEN = 120
 
 
@@ -693,9 +693,16 @@ def firstline(msg: str) -> str:
     'foo'
     >>> firstline("x" * (MAX_FIRSTLINE_LEN + 1)) == "x" * MAX_FIRSTLINE_LEN
     True
+    >>> firstline("x" * MAX_FIRSTLINE_LEN + "\r\nbar") == "x" * MAX_FIRSTLINE_LEN
+    True
     """
-    match = EOL_PATTERN.search(msg)
-    end = match.start() if match else len(msg)
+    # Only the first MAX_FIRSTLINE_LEN characters (plus a possible "\n") can
+    # affect the result, so there is no need to scan the rest of msg.
+    end = msg.find("\n", 0, MAX_FIRSTLINE_LEN + 1)
+    if end == -1:
+        end = len(msg)
+    elif end > 0 and msg[end - 1] == "\r":
+        end -= 1
     end = min(end, MAX_FIRSTLINE_LEN)
     return msg[:end]
 
@@ -56,13 +56,28 @@ def github_pull_request_number(repo, ctx, **args) -> Optional[int]:
 # between "no mapping" and "mapping with a value of None".
 _NO_ENTRY = {}
 
-_GITHUB_OAUTH_TOKEN_CACHE_KEY = "github_token"
 _GITHUB_PULL_REQUEST_URL_REVCACHE_KEY = "github_pr_url"
 _GITHUB_PULL_REQUEST_DATA_REVCACHE_KEY = "github_pr_data"
 _GITHUB_PULL_REQUEST_STORE_KEY = "github_pr_store"
 
 
 def get_pull_request_url_for_rev(repo, ctx, **args) -> Optional[PullRequestId]:
+    r"""Returns the pull request for a commit, caching the result in the
+    revcache, including the absence of one.
+    >>> from .testutil import FakeContext, FakeRepo, fake_args
+    >>> args = fake_args()
+    >>> ctx = FakeContext('foo\nbar')
+    >>> get_pull_request_url_for_rev(FakeRepo(), ctx, **args) is None
+    True
+    >>> args['revcache']
+    {'github_pr_url': None}
+
+    The commit is not scanned again, so a pull request URL showing up in the
+    description later is not seen:
+    >>> ctx._desc = 'Pull Request resolved: https://github.com/bolinfest/ghstack-testing/pull/71'
+    >>> get_pull_request_url_for_rev(FakeRepo(), ctx, **args) is None
+    True
+    """
     revcache = args["revcache"]
     pull_request_url = revcache.get(_GITHUB_PULL_REQUEST_URL_REVCACHE_KEY, _NO_ENTRY)
     if pull_request_url is not _NO_ENTRY:
@@ -71,22 +86,40 @@ def get_pull_request_url_for_rev(repo, ctx, **args) -> Optional[PullRequestId]:
     store = get_pull_request_store(repo, args["cache"])
     pull_request_url = get_pull_request_for_context(store, ctx)
 
-    revcache[_GITHUB_PULL_REQUEST_URL_REVCACHE_KEY] = (
-        pull_request_url if pull_request_url is not None else _NO_ENTRY
-    )
+    # Cache None as well so commits without a pull request are only checked
+    # once.
+    revcache[_GITHUB_PULL_REQUEST_URL_REVCACHE_KEY] = pull_request_url
     return pull_request_url
 
 
-def get_pull_request_data_for_rev(repo, ctx, **args) -> GraphQLPullRequest:
+def get_pull_request_data_for_rev(repo, ctx, **args) -> Optional[GraphQLPullRequest]:
+    r"""Returns the pull request data for a commit, caching the result in the
+    revcache. A commit without a pull request caches None without making a
+    request.
+    >>> from .testutil import FakeContext, FakeRepo, fake_args
+    >>> args = fake_args()
+    >>> ctx = FakeContext('foo\nbar')
+    >>> get_pull_request_data_for_rev(FakeRepo(), ctx, **args) is None
+    True
+    >>> sorted(args['revcache'].items())
+    [('github_pr_data', None), ('github_pr_url', None)]
+    >>> ctx._desc = 'Pull Request resolved: https://github.com/bolinfest/ghstack-testing/pull/71'
+    >>> get_pull_request_data_for_rev(FakeRepo(), ctx, **args) is None
+    True
+    """
     revcache = args["revcache"]
     pull_request_data = revcache.get(_GITHUB_PULL_REQUEST_DATA_REVCACHE_KEY, _NO_ENTRY)
 
-    # If there is a cache miss, we need both (1) an OAuth token and (2) a pull
-    # request URL in the commit message to fetch pull request data.
+    # On a cache miss, pull request data can only be fetched if there is a pull
+    # request URL in the commit message. Authentication is left to the gh CLI,
+    # so no credentials are read unless a request is actually made.
     if pull_request_data is _NO_ENTRY:
         pull_request = get_pull_request_url_for_rev(repo, ctx, **args)
         if pull_request:
             pull_request_data = get_pull_request_data(repo, pull_request)
+        else:
+            pull_request_data = None
+        revcache[_GITHUB_PULL_REQUEST_DATA_REVCACHE_KEY] = pull_request_data
     return pull_request_data
 
 
@@ -214,7 +214,12 @@ def _loadfileblob(repo, path, node):
         cachepath = os.path.join(repo.path, "remotefilelogcache")
 
     filecachepath = os.path.join(cachepath, key)
-    if not os.path.exists(filecachepath) or os.path.getsize(filecachepath) == 0:
+    # A single stat answers both "does it exist" and "is it empty".
+    try:
+        cached = os.stat(filecachepath).st_size != 0
+    except OSError:
+        cached = False
+    if not cached:
         text = readvalue(repo, path, node)
         # everything should be user & group read/writable
         oldumask = os.umask(0o002)
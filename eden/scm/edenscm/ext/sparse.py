@@ -3302,8 +3302,8 @@ class negatematcher(matchmod.basematcher):
         super(negatematcher, self).__init__(matcher._root, matcher._cwd)
         self._matcher = matcher
 
-    def __call__(self, value):
-        return not self._matcher(value)
+    def matchfn(self, value):
+        return not self._matcher.matchfn(value)
 
     def __repr__(self):
         return "<negatematcher matcher=%r>" % self._matcher
@@ -13,6 +13,7 @@
 from __future__ import absolute_import, print_function
 
 import copy
+import functools
 import os
 import re
 from typing import List, Optional, Pattern, Sized, Tuple
@@ -20,7 +21,7 @@ from typing import List, Optional, Pattern, Sized, Tuple
 from bindings import pathmatcher
 from edenscm.pathutil import pathauditor
 
-from . import error, pathutil, pycompat, util
+from . import error, pathutil, util
 from .i18n import _
 from .pycompat import decodeutf8
 
@@ -44,15 +45,34 @@ allpatternkinds = (
 )
 cwdrelativepatternkinds = ("relpath", "glob")
 
+# Frozensets of pattern kinds for membership tests in hot loops.
+_allpatternkindsset = frozenset(allpatternkinds)
+_cwdrelativepatternkindsset = frozenset(cwdrelativepatternkinds)
+# Kinds matching a path and everything under it.
+_pathkinds = frozenset(("path", "relpath"))
+# Kinds that are not globs but might be mistaken for one.
+_nonglobpathkinds = frozenset(("path", "relpath", "rootfilesin"))
+# Kinds whose regex is an escaped path, so they can never fail to compile.
+_alwaysvalidkinds = frozenset(("path", "relpath", "rootfilesin"))
+# Kinds normalized with util.normpath rather than made cwd-relative.
+_normpathkinds = frozenset(("relglob", "path", "rootfilesin"))
+_listfilekinds = frozenset(("listfile", "listfile0"))
+
 propertycache = util.propertycache
 
 
+@functools.lru_cache(maxsize=256)
 def _rematcher(regex):
     """compile the regexp with the best available regexp engine and return a
-    matcher function"""
+    matcher function
+
+    Results are cached since the same ignore and sparse patterns are compiled
+    over and over within a single command.
+    """
     m = util.re.compile(regex)
     try:
-        # slightly faster, provided by facebook's re2 bindings
+        # Provided by the Rust regex bindings (and re2). Unlike match(), it does
+        # not build a match object, so the regex crate can use its DFA engine.
         return m.test_match
     except AttributeError:
         return m.match
@@ -108,7 +128,7 @@ def _kindpatsalwaysmatch(kindpats) -> bool:
 
     for kind, pat, source in kindpats:
         # TODO: update me?
-        if pat != "" or kind not in ["relpath", "glob"]:
+        if pat != "" or kind not in _cwdrelativepatternkindsset:
             return False
     return True
 
@@ -349,8 +369,9 @@ def _donormalize(patterns, default, root, cwd, auditor, warn):
     """Convert 'kind:pat' from the patterns list to tuples with kind and
     normalized and rooted patterns and with listfiles expanded."""
     kindpats = []
-    for kind, pat in [_patsplit(p, default) for p in patterns]:
-        if warn and kind in {"path", "relpath", "rootfilesin"} and "*" in pat:
+    for pattern in patterns:
+        kind, pat = _patsplit(pattern, default)
+        if warn and kind in _nonglobpathkinds and "*" in pat:
             warn(
                 _(
                     "possible glob in non-glob pattern '{pat}', did you mean 'glob:{pat}'? "
@@ -358,11 +379,11 @@ def _donormalize(patterns, default, root, cwd, auditor, warn):
                 ).format(pat=pat)
             )
 
-        if kind in cwdrelativepatternkinds:
+        if kind in _cwdrelativepatternkindsset:
             pat = pathutil.canonpath(root, cwd, pat, auditor)
-        elif kind in ("relglob", "path", "rootfilesin"):
+        elif kind in _normpathkinds:
             pat = util.normpath(pat)
-        elif kind in ("listfile", "listfile0"):
+        elif kind in _listfilekinds:
             try:
                 files = decodeutf8(util.readfile(pat))
                 if kind == "listfile0":
@@ -516,34 +537,37 @@ class _tree(dict):
     def visitdir(self, path):
         """Similar to matcher.visitdir"""
         path = normalizerootdir(path, "visitdir")
-        if self.matchrecursive:
-            return "all"
-        elif self.unsurerecursive:
-            return True
-        elif path == "":
-            return True
-
-        if self._kindpats and self._compiledpats(path):
-            # XXX: This is incorrect. But re patterns are already used in
-            # production. We should kill them!
-            # Need to test "if every string starting with 'path' matches".
-            # Obviously it's impossible to test *every* string with the
-            # standard regex API, therefore pick a random strange path to test
-            # it approximately.
-            if self._compiledpats("%s/*/_/-/0/*" % path):
+        # Descend one path component per iteration. At each step, "tree" is
+        # the subtree for the components consumed so far and "path" is the
+        # remainder, relative to it.
+        tree = self
+        while True:
+            if tree.matchrecursive:
                 return "all"
-            else:
+            elif tree.unsurerecursive:
+                return True
+            elif path == "":
                 return True
 
-        if self._globdirpats and self._compileddirpats(path):
-            return True
+            if tree._kindpats and tree._compiledpats(path):
+                # XXX: This is incorrect. But re patterns are already used in
+                # production. We should kill them!
+                # Need to test "if every string starting with 'path' matches".
+                # Obviously it's impossible to test *every* string with the
+                # standard regex API, therefore pick a random strange path to
+                # test it approximately.
+                if tree._compiledpats("%s/*/_/-/0/*" % path):
+                    return "all"
+                else:
+                    return True
 
-        subdir, rest = self._split(path)
-        subtree = self.get(subdir)
-        if subtree is None:
-            return False
-        else:
-            return subtree.visitdir(rest)
+            if tree._globdirpats and tree._compileddirpats(path):
+                return True
+
+            subdir, path = tree._split(path)
+            tree = tree.get(subdir)
+            if tree is None:
+                return False
 
     @util.propertycache
     def _compiledpats(self):
@@ -594,6 +618,27 @@ def _remainingpats(pat, prefix: Sized):
             return []
 
 
+_globmetare = re.compile(r"[\[{*?]")
+
+
+def _globprefix(pat):
+    """Return the leading path components of a glob that contain no glob
+    special characters.
+
+    >>> _globprefix("a/b/c*/d")
+    'a/b'
+    >>> _globprefix("a/b")
+    'a/b'
+    >>> _globprefix("*.c")
+    ''
+    """
+    m = _globmetare.search(pat)
+    if m is None:
+        return pat
+    end = pat.rfind("/", 0, m.start())
+    return pat[:end] if end >= 0 else ""
+
+
 def _buildvisitdir(kindpats):
     """Try to build an efficient visitdir function
 
@@ -668,16 +713,22 @@ def _buildvisitdir(kindpats):
     True
     >>> t('z')
     False
+    >>> t = _buildvisitdir([
+    ...     ('path', 'k/l', ''),
+    ...     ('relpath', 'p', ''),
+    ...     ('rootfilesin', 'm/n', ''),
+    ... ])
+    >>> t('k'), t('k/l'), t('k/l/x'), t('k/x'), t('p/q')
+    (True, 'all', 'all', False, 'all')
+    >>> t('m'), t('m/n'), t('m/n/o')
+    (True, True, False)
+    >>> _buildvisitdir([('path', '.', '')])('a')
+    'all'
     """
     tree = _tree()
     for kind, pat, _source in kindpats:
         if kind == "glob":
-            components = []
-            for p in pat.split("/"):
-                if "[" in p or "{" in p or "*" in p or "?" in p:
-                    break
-                components.append(p)
-            prefix = "/".join(components)
+            prefix = _globprefix(pat)
             matchrecursive = prefix == pat
             tree.insert(
                 prefix,
@@ -700,6 +751,11 @@ def _buildvisitdir(kindpats):
             tree.insert(
                 prefix, matchrecursive=False, repats=_remainingpats(pat, prefix)
             )
+        elif kind in _pathkinds:
+            tree.insert("" if pat == "." else pat)
+        elif kind == "rootfilesin":
+            # Only files directly in the directory match, not subdirectories.
+            tree.insert("" if pat == "." else pat, matchrecursive=False)
         else:
             # Unsupported kind
             return None
@@ -763,7 +819,7 @@ class basematcher(object):
 
     @propertycache
     def _fileset(self):
-        return set(self._files)
+        return frozenset(self._files)
 
     def exact(self, f):
         """Returns True if f is in .files()."""
@@ -1040,6 +1096,18 @@ def normalizerootdir(dir: str, funcname) -> str:
     return dir
 
 
+@functools.lru_cache(maxsize=8192)
+def _ancestordirs(dir: str) -> frozenset:
+    """Return the set of ancestor directories of dir, including the root.
+
+    >>> sorted(_ancestordirs("a/b/c"))
+    ['', 'a', 'a/b']
+    >>> sorted(_ancestordirs(""))
+    ['']
+    """
+    return frozenset(util.finddirs(dir))
+
+
 def _kindpatstoglobs(kindpats, recursive: bool = False) -> Optional[List[str]]:
     "Attempt to convert kindpats to globs that can be used in a treematcher."
     if _usetreematcher:
@@ -1150,15 +1218,42 @@ class patternmatcher(basematcher):
         super(patternmatcher, self).__init__(root, cwd, badfn)
         # kindpats are already normalized to be relative to repo-root.
         self._prefix = _prefix(kindpats)
-        self._pats, self.matchfn = _buildmatch(ctx, kindpats, "$", root)
+        self._kindpats = kindpats
+        self._ctx = ctx
         self._files = _explicitfiles(kindpats)
+        # visitdir results, keyed by directory. The patterns are fixed after
+        # construction and dirstate.walk can ask about the same directory
+        # more than once.
+        self._visitdircache = {}
+        _validatekindpats(self, kindpats)
+
+    @propertycache
+    def _matchinfo(self):
+        # Compiling the patterns can be expensive and some callers only need
+        # files() or visitdir(), so it is deferred until first use when the
+        # patterns cannot be invalid. See _validatekindpats.
+        return _buildmatch(self._ctx, self._kindpats, "$", self._root)
+
+    @propertycache
+    def _pats(self):
+        return self._matchinfo[0]
+
+    @propertycache
+    def matchfn(self):
+        return self._matchinfo[1]
 
     @propertycache
     def _dirs(self):
-        return set(util.dirs(self._fileset))
+        return frozenset(util.dirs(self._fileset))
 
     def visitdir(self, dir):
         dir = normalizerootdir(dir, "visitdir")
+        result = self._visitdircache.get(dir)
+        if result is None:
+            result = self._visitdircache[dir] = self._visitdiruncached(dir)
+        return result
+
+    def _visitdiruncached(self, dir):
         if self._prefix and dir in self._fileset:
             return "all"
         if not self._prefix:
@@ -1166,7 +1261,7 @@ class patternmatcher(basematcher):
         return (
             dir in self._fileset
             or dir in self._dirs
-            or any(parentdir in self._fileset for parentdir in util.finddirs(dir))
+            or not _ancestordirs(dir).isdisjoint(self._fileset)
         )
 
     def prefix(self):
@@ -1180,7 +1275,8 @@ class includematcher(basematcher):
     def __init__(self, root, cwd, kindpats, ctx=None, badfn=None):
         super(includematcher, self).__init__(root, cwd, badfn)
 
-        self._pats, self.matchfn = _buildmatch(ctx, kindpats, "(?:/|$)", root)
+        self._kindpats = kindpats
+        self._ctx = ctx
         # prefix is True if all patterns are recursive, so certain fast paths
         # can be enabled. Unfortunately, it's too easy to break it (ex. by
         # using "glob:*.c", "re:...", etc).
@@ -1201,21 +1297,56 @@ class includematcher(basematcher):
         visitdir = _buildvisitdir(kindpats)
         if visitdir:
             self.visitdir = visitdir
+        else:
+            # See patternmatcher._visitdircache.
+            self._visitdircache = {}
+        _validatekindpats(self, kindpats)
+
+    @propertycache
+    def _matchinfo(self):
+        # See patternmatcher._matchinfo.
+        return _buildmatch(self._ctx, self._kindpats, "(?:/|$)", self._root)
+
+    @propertycache
+    def _pats(self):
+        return self._matchinfo[0]
+
+    @propertycache
+    def matchfn(self):
+        return self._matchinfo[1]
 
     def visitdir(self, dir):
         dir = normalizerootdir(dir, "visitdir")
+        result = self._visitdircache.get(dir)
+        if result is None:
+            result = self._visitdircache[dir] = self._visitdiruncached(dir)
+        return result
+
+    def _visitdiruncached(self, dir):
         if self._prefix and dir in self._roots:
             return "all"
         return (
             dir in self._roots
             or dir in self._dirs
-            or any(parentdir in self._roots for parentdir in util.finddirs(dir))
+            or not _ancestordirs(dir).isdisjoint(self._roots)
         )
 
     def __repr__(self):
         return "<includematcher includes=%r>" % self._pats
 
 
+def _validatekindpats(matcher, kindpats):
+    """Compile the patterns of a lazily compiled matcher unless they are all
+    plain paths.
+
+    Globs, regexps, filesets and subincludes can be invalid. Building them
+    here keeps the "invalid pattern" abort at matcher construction instead of
+    at the first match call, which might be inside a walk.
+    """
+    if not all(kind in _alwaysvalidkinds for kind, pat, source in kindpats):
+        matcher._matchinfo
+
+
 def _buildpatternmatcher(
     root, cwd, kindpats, ctx=None, badfn=None, fallbackmatcher=patternmatcher
 ):
@@ -1334,7 +1465,7 @@ class exactmatcher(basematcher):
 
     @propertycache
     def _dirs(self):
-        return set(util.dirs(self._fileset))
+        return frozenset(util.dirs(self._fileset))
 
     def visitdir(self, dir):
         dir = normalizerootdir(dir, "visitdir")
@@ -1370,7 +1501,9 @@ class differencematcher(basematcher):
         self.traversedir = m1.traversedir
 
     def matchfn(self, f):
-        return self._m1(f) and (not self._m2(f) or self._m1.exact(f))
+        return self._m1.matchfn(f) and (
+            not self._m2.matchfn(f) or self._m1.exact(f)
+        )
 
     @propertycache
     def _files(self):
@@ -1449,7 +1582,7 @@ class intersectionmatcher(basematcher):
         return self._m1.files() + self._m2.files()
 
     def matchfn(self, f):
-        return self._m1(f) and self._m2(f)
+        return self._m1.matchfn(f) and self._m2.matchfn(f)
 
     def visitdir(self, dir):
         dir = normalizerootdir(dir, "visitdir")
@@ -1504,6 +1637,8 @@ class subdirmatcher(basematcher):
     def __init__(self, path, matcher):
         super(subdirmatcher, self).__init__(matcher._root, matcher._cwd)
         self._path = path
+        # Prepended to every path passed to the wrapped matcher.
+        self._pathprefix = path + "/"
         self._matcher = matcher
         self._always = matcher.always()
 
@@ -1514,33 +1649,33 @@ class subdirmatcher(basematcher):
         # If the parent repo had a path to this subrepo and the matcher is
         # a prefix matcher, this submatcher always matches.
         if matcher.prefix():
-            self._always = any(f == path for f in matcher._files)
+            self._always = path in matcher._fileset
 
     def bad(self, f, msg):
-        self._matcher.bad(self._path + "/" + f, msg)
+        self._matcher.bad(self._pathprefix + f, msg)
 
     def abs(self, f):
-        return self._matcher.abs(self._path + "/" + f)
+        return self._matcher.abs(self._pathprefix + f)
 
     def rel(self, f):
-        return self._matcher.rel(self._path + "/" + f)
+        return self._matcher.rel(self._pathprefix + f)
 
     def uipath(self, f):
-        return self._matcher.uipath(self._path + "/" + f)
+        return self._matcher.uipath(self._pathprefix + f)
 
     def matchfn(self, f):
         # Some information is lost in the superclass's constructor, so we
         # can not accurately create the matching function for the subdirectory
         # from the inputs. Instead, we override matchfn() and visitdir() to
         # call the original matcher with the subdirectory path prepended.
-        return self._matcher.matchfn(self._path + "/" + f)
+        return self._matcher.matchfn(self._pathprefix + f)
 
     def visitdir(self, dir):
         dir = normalizerootdir(dir, "visitdir")
         if dir == "":
             dir = self._path
         else:
-            dir = self._path + "/" + dir
+            dir = self._pathprefix + dir
         return self._matcher.visitdir(dir)
 
     def always(self):
@@ -1568,7 +1703,7 @@ class unionmatcher(basematcher):
 
     def matchfn(self, f):
         for match in self._matchers:
-            if match(f):
+            if match.matchfn(f):
                 return True
         return False
 
@@ -1624,7 +1759,7 @@ class xormatcher(basematcher):
         self.m2 = m2
 
     def matchfn(self, f):
-        return bool(self.m1(f)) ^ bool(self.m2(f))
+        return bool(self.m1.matchfn(f)) ^ bool(self.m2.matchfn(f))
 
     def visitdir(self, dir):
         m1dir = self.m1.visitdir(dir)
@@ -1654,11 +1789,11 @@ class recursivematcher(basematcher):
         self._matcher = matcher
 
     def matchfn(self, f):
-        match = self._matcher
+        match = self._matcher.matchfn
         return match(f) or any(map(match, util.dirs((f,))))
 
     def visitdir(self, dir):
-        if self(dir):
+        if self.matchfn(dir):
             return "all"
         return self._matcher.visitdir(dir)
 
@@ -1676,11 +1811,27 @@ def _patsplit(pattern, default):
     pattern."""
     if ":" in pattern:
         kind, pat = pattern.split(":", 1)
-        if kind in allpatternkinds:
+        if kind in _allpatternkindsset:
             return kind, pat
     return default, pattern
 
 
+# Tokens of an extended glob, used by _globre. Every character of a glob is
+# part of exactly one token, so finditer() walks the whole pattern.
+_globtokenre = re.compile(
+    r"(?P<literal>[^*?\[{},\\]+)"
+    r"|(?P<star>\*\*/?|\*)"
+    r"|(?P<any>\?)"
+    r"|(?P<class>\[(?:[!\]]|(?![!\]]))[^\]]*\])"
+    r"|(?P<bracket>\[)"
+    r"|(?P<open>\{)"
+    r"|(?P<close>\})"
+    r"|(?P<comma>,)"
+    r"|(?P<escape>\\.?)",
+    re.DOTALL,
+)
+
+
 def _globre(pat: Sized) -> str:
     r"""Convert an extended glob string to a regexp string.
 
@@ -1701,71 +1852,53 @@ def _globre(pat: Sized) -> str:
     [a*?!^][\^b][^c]
     >>> bprint(_globre(r'{a,b}'))
     (?:a|b)
+    >>> bprint(_globre(r'[]a][!]x[{a,}},'))
+    []a][^]x\[(?:a|)\},
     >>> bprint(_globre(r'.\*\?'))
     \.\*\?
     """
-    i, n = 0, len(pat)
-    res = ""
+    res = []
     group = 0
     escape = util.re.escape
 
-    def peek():
-        return i < n and pat[i : i + 1]
-
-    while i < n:
-        # pyre-fixme[16]: `Sized` has no attribute `__getitem__`.
-        c = pat[i : i + 1]
-        i += 1
-        if c not in "*?[{},\\":
-            res += escape(c)
-        elif c == "*":
-            if peek() == "*":
-                i += 1
-                if peek() == "/":
-                    i += 1
-                    res += "(?:.*/)?"
-                else:
-                    res += ".*"
-            else:
-                res += "[^/]*"
-        elif c == "?":
-            res += "."
-        elif c == "[":
-            j = i
-            if j < n and pat[j : j + 1] in "!]":
-                j += 1
-            while j < n and pat[j : j + 1] != "]":
-                j += 1
-            if j >= n:
-                res += "\\["
+    for m in _globtokenre.finditer(pat):
+        kind = m.lastgroup
+        tok = m.group()
+        if kind == "literal":
+            res.append(escape(tok))
+        elif kind == "star":
+            if tok == "**/":
+                res.append("(?:.*/)?")
+            elif tok == "**":
+                res.append(".*")
             else:
-                stuff = pat[i:j].replace("\\", "\\\\")
-                i = j + 1
-                if stuff[0:1] == "!":
-                    stuff = "^" + stuff[1:]
-                elif stuff[0:1] == "^":
-                    stuff = "\\" + stuff
-                res = "%s[%s]" % (res, stuff)
-        elif c == "{":
+                res.append("[^/]*")
+        elif kind == "any":
+            res.append(".")
+        elif kind == "class":
+            stuff = tok[1:-1].replace("\\", "\\\\")
+            if stuff[0:1] == "!":
+                stuff = "^" + stuff[1:]
+            elif stuff[0:1] == "^":
+                stuff = "\\" + stuff
+            res.append("[%s]" % stuff)
+        elif kind == "open":
             group += 1
-            res += "(?:"
-        elif c == "}" and group:
-            res += ")"
+            res.append("(?:")
+        elif kind == "close" and group:
+            res.append(")")
             group -= 1
-        elif c == "," and group:
-            res += "|"
-        elif c == "\\":
-            p = peek()
-            if p:
-                i += 1
-                res += escape(p)
-            else:
-                res += escape(c)
+        elif kind == "comma" and group:
+            res.append("|")
+        elif kind == "escape":
+            res.append(escape(tok[1:] or tok))
         else:
-            res += escape(c)
-    return res
+            # An unterminated "[", or a "}" or "," outside of a group.
+            res.append(escape(tok))
+    return "".join(res)
 
 
+@functools.lru_cache(maxsize=4096)
 def _regex(kind, pat, globsuffix):
     """Convert a (normalized) pattern of any kind into a regular expression.
     globsuffix is appended to the regexp of globs."""
@@ -1815,8 +1948,6 @@ def _buildmatch(ctx, kindpats, globsuffix, root):
                         return True
             return False
 
-        matchfuncs.append(matchsubinclude)
-
     fset, kindpats = _expandsets(kindpats, ctx)
     if fset:
         matchfuncs.append(fset.__contains__)
@@ -1826,20 +1957,44 @@ def _buildmatch(ctx, kindpats, globsuffix, root):
         regex, mf = _buildregexmatch(kindpats, globsuffix)
         matchfuncs.append(mf)
 
+    # Cheapest checks first: set lookup, then regex, then subincludes.
+    if subincludes:
+        matchfuncs.append(matchsubinclude)
+
     if len(matchfuncs) == 1:
         return regex, matchfuncs[0]
+    elif len(matchfuncs) == 2:
+        mf0, mf1 = matchfuncs
+        return regex, lambda f: mf0(f) or mf1(f)
+    elif len(matchfuncs) == 3:
+        mf0, mf1, mf2 = matchfuncs
+        return regex, lambda f: mf0(f) or mf1(f) or mf2(f)
     else:
-        return regex, lambda f: any(mf(f) for mf in matchfuncs)
+        return regex, lambda f: False
 
 
 def _buildregexmatch(kindpats: List, globsuffix):
     """Build a match function from a list of kinds and kindpats,
     return regexp string and a matcher function."""
     regex = _buildregex(kindpats, globsuffix)
+    if all(k in _pathkinds for k, p, s in kindpats):
+        # Plain path prefixes do not need a regex engine.
+        return regex, _buildpathmatch(kindpats)
+    partitionedmatch = _buildpartitionedmatch(kindpats, globsuffix)
+    if partitionedmatch is not None:
+        return regex, partitionedmatch
+    return regex, _compileregexmatch(kindpats, globsuffix, regex)
+
+
+def _compileregexmatch(kindpats: List, globsuffix, regex=None):
+    """Compile kindpats into a match function without partitioning them by
+    root. The regex is only split if it is too large for the regex engine."""
+    if regex is None:
+        regex = _buildregex(kindpats, globsuffix)
     try:
         if len(regex) > MAX_RE_SIZE:
             raise OverflowError
-        return regex, _rematcher(regex)
+        return _rematcher(regex)
     except OverflowError:
         # We're using a Python with a tiny regex engine and we
         # made it explode, so we'll divide the pattern list in two
@@ -1847,9 +2002,9 @@ def _buildregexmatch(kindpats: List, globsuffix):
         l = len(kindpats)
         if l < 2:
             raise
-        regexa, a = _buildregexmatch(kindpats[: l // 2], globsuffix)
-        regexb, b = _buildregexmatch(kindpats[l // 2 :], globsuffix)
-        return regex, lambda s: a(s) or b(s)
+        a = _compileregexmatch(kindpats[: l // 2], globsuffix)
+        b = _compileregexmatch(kindpats[l // 2 :], globsuffix)
+        return lambda s: a(s) or b(s)
     except re.error:
         for k, p, s in kindpats:
             try:
@@ -1862,6 +2017,119 @@ def _buildregexmatch(kindpats: List, globsuffix):
         raise error.Abort(_("invalid pattern"))
 
 
+# Maximum number of per-root regexes _buildpartitionedmatch compiles for one
+# matcher, kept well below the size of the _rematcher cache.
+_MAXREGEXPARTITIONS = 32
+
+
+def _literalroot(kind, pat):
+    r"""Return the first path component shared by every path the pattern can
+    match, or None if it is not known.
+
+    >>> _literalroot('glob', 'a/b/*.c'), _literalroot('glob', '*.c')
+    ('a', None)
+    >>> _literalroot('path', 'a'), _literalroot('rootfilesin', '.')
+    ('a', None)
+    >>> _literalroot('relglob', 'a/b')
+
+    Escaped glob prefixes are not literal paths, so they are not bucketed:
+
+    >>> _literalroot('glob', 'a\\.b/*.c')
+    """
+    if kind == "glob":
+        pat = _globprefix(pat)
+        if "\\" in pat:
+            return None
+    elif kind not in _pathkinds and kind != "rootfilesin":
+        return None
+    if pat == "" or pat == ".":
+        return None
+    return pat.split("/", 1)[0]
+
+
+def _buildpartitionedmatch(kindpats: List, globsuffix):
+    r"""Build a match function that only tries the patterns that can match the
+    first path component of a file, plus the patterns without a literal first
+    component. Return None if there are fewer than two such components.
+
+    >>> m = _buildpartitionedmatch(
+    ...     [('glob', 'a/*.c', ''), ('path', 'b', ''), ('relglob', '*.h', '')], '$')
+    >>> [bool(m(f)) for f in ['a/x.c', 'b/x.c', 'c/x.h', 'c/x.c', 'a/x.d']]
+    [True, True, True, False, False]
+    >>> _buildpartitionedmatch([('glob', 'a/*.c', ''), ('glob', 'a/*.h', '')], '$')
+    >>> m = _buildpartitionedmatch(
+    ...     [('glob', 'a\\.b/*.c', ''), ('glob', 'src/*.c', ''), ('path', 'b', '')], '$')
+    >>> [bool(m(f)) for f in ['a.b/x.c', 'src/x.c', 'axb/x.c']]
+    [True, True, False]
+
+    At most _MAXREGEXPARTITIONS buckets and the tail are compiled:
+
+    >>> kindpats = [('glob', 'cap%d/*.c' % i, '') for i in range(64)]
+    >>> misses = _rematcher.cache_info().misses
+    >>> m = _buildpartitionedmatch(kindpats + [('relglob', '*.cap', '')], '$')
+    >>> _rematcher.cache_info().misses - misses <= _MAXREGEXPARTITIONS + 1
+    True
+    >>> [bool(m(f)) for f in ['cap0/x.c', 'cap63/x.c', 'x/y.cap', 'cap0/x.h']]
+    [True, True, True, False]
+    """
+    buckets = {}
+    tail = []
+    for kindpat in kindpats:
+        root = _literalroot(kindpat[0], kindpat[1])
+        if root is None:
+            tail.append(kindpat)
+        else:
+            buckets.setdefault(root, []).append(kindpat)
+    if len(buckets) < 2:
+        return None
+    if len(buckets) > _MAXREGEXPARTITIONS:
+        # Every bucket is a separate regex to compile and cache in
+        # _rematcher. Keep the largest buckets and leave the rest to the tail.
+        roots = sorted(buckets, key=lambda root: len(buckets[root]), reverse=True)
+        for root in roots[_MAXREGEXPARTITIONS:]:
+            tail.extend(buckets.pop(root))
+
+    def build(pats):
+        # Never partition again, or the capped-off buckets in the tail
+        # would be split into buckets of their own.
+        if all(k in _pathkinds for k, p, s in pats):
+            return _buildpathmatch(pats)
+        return _compileregexmatch(pats, globsuffix)
+
+    bucketmatchers = {root: build(pats) for root, pats in buckets.items()}
+    if tail:
+        tailmatch = build(tail)
+    else:
+        tailmatch = lambda f: False
+
+    def matchfn(f):
+        bucketmatch = bucketmatchers.get(f.split("/", 1)[0])
+        return (bucketmatch is not None and bucketmatch(f)) or tailmatch(f)
+
+    return matchfn
+
+
+def _buildpathmatch(kindpats: List):
+    """Build a match function equivalent to the regex of path and relpath
+    kindpats, using set lookups and str.startswith.
+
+    >>> m = _buildpathmatch([('path', 'a/b', ''), ('relpath', 'c', '')])
+    >>> [bool(m(f)) for f in ['a/b', 'a/b/c', 'a/bc', 'c/d', 'd']]
+    [True, True, False, True, False]
+    >>> bool(_buildpathmatch([('path', '.', '')])('a'))
+    True
+    """
+    paths = set()
+    for kind, pat, _source in kindpats:
+        if pat == "." or (not pat and kind == "relpath"):
+            # _regex returns "" (match everything) for these.
+            return lambda f: True
+        paths.add(pat)
+    paths = frozenset(paths)
+    prefixes = tuple(p + "/" for p in paths)
+    return lambda f: f in paths or f.startswith(prefixes)
+
+
 def _buildregex(kindpats: List, globsuffix: str) -> str:
     """Convert a (normalized) patterns of any kind into a regular expression.
 
@@ -1882,12 +2150,7 @@ def _patternrootsanddirs(kindpats):
     d = []
     for kind, pat, source in kindpats:
         if kind == "glob":  # find the non-glob prefix
-            root = []
-            for p in pat.split("/"):
-                if "[" in p or "{" in p or "*" in p or "?" in p:
-                    break
-                root.append(p)
-            r.append("/".join(root))
+            r.append(_globprefix(pat))
         elif kind in ("relpath", "path"):
             if pat == ".":
                 pat = ""
@@ -1958,13 +2221,25 @@ def _explicitfiles(kindpats):
 def _prefix(kindpats) -> bool:
     """Whether all the patterns match a prefix (i.e. recursively)"""
     for kind, pat, source in kindpats:
-        if kind not in ("path", "relpath"):
+        if kind not in _pathkinds:
             return False
     return True
 
 
 _commentre = None
 
+# Classifies a (comment-stripped) line of a pattern file: a "syntax:" line, or
+# a pattern with an optional prefix that is either already a pattern kind
+# ("rels") or a syntax name followed by ":" ("syntaxname"). Note "include" and
+# "subinclude" are matched without a trailing ":" so the ":" stays part of the
+# pattern, e.g. "include:foo" becomes ("include", ":foo").
+_patternlinere = re.compile(
+    r"(?:syntax:(?P<newsyntax>.*)"
+    r"|(?P<rels>relre:|relglob:|include|subinclude)"
+    r"|(?P<syntaxname>re|regexp|glob):)?"
+    r"(?P<pat>.*)"
+)
+
 
 def readpatternfile(filepath, warn, sourceinfo: bool = False):
     """parse a pattern file, returning a list of
@@ -2000,10 +2275,11 @@ def readpatternfile(filepath, warn, sourceinfo: bool = False):
 
     fp = open(filepath, "rb")
     for lineno, line in enumerate(util.iterfile(fp), start=1):
+        line = decodeutf8(line)
         if "#" in line:
             global _commentre
             if not _commentre:
-                _commentre = util.re.compile(rb"((?:^|[^\\])(?:\\\\)*)#.*")
+                _commentre = util.re.compile(r"((?:^|[^\\])(?:\\\\)*)#.*")
             # remove comments prefixed by an even number of escapes
             m = _commentre.search(line)
             if m:
@@ -2014,8 +2290,10 @@ def readpatternfile(filepath, warn, sourceinfo: bool = False):
         if not line:
             continue
 
-        if line.startswith("syntax:"):
-            s = line[7:].strip()
+        m = _patternlinere.match(line)
+        newsyntax = m.group("newsyntax")
+        if newsyntax is not None:
+            s = newsyntax.strip()
             try:
                 syntax = syntaxes[s]
             except KeyError:
@@ -2023,16 +2301,11 @@ def readpatternfile(filepath, warn, sourceinfo: bool = False):
                     warn(_("%s: ignoring invalid syntax '%s'\n") % (filepath, s))
             continue
 
-        linesyntax = syntax
-        for s, rels in pycompat.iteritems(syntaxes):
-            if line.startswith(rels):
-                linesyntax = rels
-                line = line[len(rels) :]
-                break
-            elif line.startswith(s + ":"):
-                linesyntax = rels
-                line = line[len(s) + 1 :]
-                break
+        linesyntax = m.group("rels")
+        if linesyntax is None:
+            s = m.group("syntaxname")
+            linesyntax = syntaxes[s] if s is not None else syntax
+        line = m.group("pat")
         if sourceinfo:
             patterns.append((linesyntax + line, lineno, line))
         else:
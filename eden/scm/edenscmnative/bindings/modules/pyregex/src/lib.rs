@@ -65,6 +65,13 @@ py_class!(class StringPattern |py| {
         StringMatchObject::new(py, self.match_re(py), s, self.clone_ref(py))
     }
 
+    /// Like `match`, but only reports whether there is a match. This skips
+    /// resolving capture groups and building a match object, which lets the
+    /// regex crate use its fastest (DFA) matching engine.
+    def test_match(&self, s: &str) -> PyResult<bool> {
+        Ok(self.match_re(py).is_match(s))
+    }
+
     def __repr__(&self) -> PyResult<String> {
         Ok(format!("<StringPattern {:?}>", self.raw_pattern(py)))
     }
@@ -180,6 +187,11 @@ py_class!(class BytesPattern |py| {
         BytesMatchObject::new(py, self.match_re(py), s, self.clone_ref(py))
     }
 
+    /// Like `match`, but only reports whether there is a match.
+    def test_match(&self, s: PyBytes) -> PyResult<bool> {
+        Ok(self.match_re(py).is_match(s.data(py)))
+    }
+
     def __repr__(&self) -> PyResult<String> {
         Ok(format!("<BytesPattern {:?}>", self.raw_pattern(py)))
     }
@@ -1,9 +1,9 @@
 import configparser
+import functools
 import getpass
 import logging
 import os
 import re
-from pathlib import Path
 from typing import NamedTuple, Optional
 
 import ghstack.logs
@@ -36,18 +36,49 @@ Config = NamedTuple('Config', [
 ])
 
 
+# Maximum number of directories checked for a .ghstackrc when cwd is outside
+# the home directory.
+_MAX_CONFIG_SEARCH_DEPTH = 20
+
+
+@functools.lru_cache(maxsize=64)
+def _find_config_path(cwd: str) -> Optional[str]:
+    """Returns the path of the .ghstackrc in cwd or its nearest ancestor that
+    has one, or None if there is no such file.
+
+    Results are memoized per cwd, so callers that read the config repeatedly
+    do not pay for the walk (one stat per ancestor directory) every time.
+    """
+    home = os.path.normpath(os.path.expanduser("~"))
+    # read_config() falls back to ~/.ghstackrc anyway, so there is nothing to
+    # gain from looking above the home directory.
+    under_home = cwd == home or cwd.startswith(os.path.join(home, ""))
+    current_dir = cwd
+    depth = 0
+    while True:
+        tentative_config_path = os.path.join(current_dir, ".ghstackrc")
+        if os.path.isfile(tentative_config_path):
+            return tentative_config_path
+        depth += 1
+        if current_dir == home:
+            break
+        if not under_home and depth >= _MAX_CONFIG_SEARCH_DEPTH:
+            # cwd is not under the home directory, so there is no natural
+            # place to stop. Bound the walk so a deeply nested cwd (e.g., a
+            # build directory in a container) does not stat every ancestor.
+            break
+        parent = os.path.dirname(current_dir)
+        if parent == current_dir:
+            break
+        current_dir = parent
+
+    return None
+
+
 def read_config(*, request_circle_token: bool = False) -> Config:  # noqa: C901
     config = configparser.ConfigParser()
 
-    config_path = None
-    current_dir = Path(os.getcwd())
-
-    while current_dir != Path('/'):
-        tentative_config_path = "/".join([str(current_dir), ".ghstackrc"])
-        if os.path.exists(tentative_config_path):
-            config_path = tentative_config_path
-            break
-        current_dir = current_dir.parent
+    config_path = _find_config_path(os.getcwd())
 
     write_back = False
     if config_path is None:
@@ -55,7 +86,10 @@ def read_config(*, request_circle_token: bool = False) -> Config:  # noqa: C901
         write_back = True
 
     logging.debug(f"config_path = {config_path}")
-    config.read(['.ghstackrc', config_path])
+    # If ./.ghstackrc exists, _find_config_path() has already returned it, so
+    # there is no need to parse it separately (and then a second time as
+    # config_path).
+    config.read(config_path)
 
     if not config.has_section('ghstack'):
         config.add_section('ghstack')
@@ -152,6 +186,8 @@ def read_config(*, request_circle_token: bool = False) -> Config:  # noqa: C901
     if write_back:
         with open(config_path, 'w') as f:
             config.write(f)
+        # A new .ghstackrc may have just been created.
+        _find_config_path.cache_clear()
         logging.info("NB: configuration saved to {}".format(config_path))
 
     conf = Config(
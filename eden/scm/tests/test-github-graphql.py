@@ -0,0 +1,85 @@
+from __future__ import absolute_import
+
+import asyncio
+import unittest
+
+import silenttestrunner
+from edenscm.ext.github import graphql
+from edenscm.ext.github.pullrequest import PullRequestId
+from ghstack.github_gh_cli import Result
+
+
+class FakeGitHubEndpoint(object):
+    """Answers batched and single pull request queries with canned data.
+
+    A batch that contains a number in `missing` fails as a whole, like GitHub
+    does when one of the aliased pull requests does not exist.
+    """
+
+    def __init__(self, missing=()):
+        self.missing = set(missing)
+        self.requests = []
+
+    async def graphql(self, query, **kwargs):
+        self.requests.append(kwargs)
+        if "number" in kwargs:
+            number = kwargs["number"]
+            if number in self.missing:
+                return Result(error="Could not resolve to a PullRequest")
+            return Result(ok={"data": {"repository": {"pullRequest": _pr(number)}}})
+
+        numbers = [kwargs["number%d" % i] for i in range(len(kwargs) // 3)]
+        if self.missing.intersection(numbers):
+            return Result(error="Could not resolve to a PullRequest")
+        data = {
+            "pr%d" % i: {"pullRequest": _pr(number)} for i, number in enumerate(numbers)
+        }
+        return Result(ok={"data": data})
+
+
+def _pr(number):
+    return {"number": number}
+
+
+def _prids(numbers):
+    return [PullRequestId("github.com", "owner", "repo", n) for n in numbers]
+
+
+def _numbers(results):
+    return [r["number"] if r is not None else None for r in results]
+
+
+class GetPullRequestDataListTests(unittest.TestCase):
+    def setUp(self):
+        asyncio.set_event_loop(asyncio.new_event_loop())
+
+    def tearDown(self):
+        asyncio.get_event_loop().close()
+
+    def testBatchesKeepOrder(self):
+        numbers = list(range(100, 100 + 2 * graphql._BATCH_SIZE + 5))
+        github = FakeGitHubEndpoint()
+        results = graphql.get_pull_request_data_list(github, _prids(numbers))
+        self.assertEqual(_numbers(results), numbers)
+        # One request per batch, none per pull request.
+        self.assertEqual(len(github.requests), 3)
+
+    def testFailedBatchFallsBackToSingleRequests(self):
+        size = graphql._BATCH_SIZE
+        numbers = list(range(100, 100 + 2 * size + 5))
+        missing = numbers[size + 3]
+        github = FakeGitHubEndpoint(missing=[missing])
+        results = graphql.get_pull_request_data_list(github, _prids(numbers))
+
+        expected = [n if n != missing else None for n in numbers]
+        self.assertEqual(_numbers(results), expected)
+        self.assertIsNone(results[size + 3])
+
+        # Only the second batch is fetched again, one pull request at a time.
+        single = [r["number"] for r in github.requests if "number" in r]
+        self.assertEqual(single, numbers[size : 2 * size])
+        self.assertEqual(len(github.requests), 3 + size)
+
+
+if __name__ == "__main__":
+    silenttestrunner.main(__name__)
@@ -4,7 +4,7 @@ import os
 import unittest
 
 import silenttestrunner
-from edenscm import match as matchmod
+from edenscm import error, match as matchmod
 from hghave import require
 
 
@@ -32,6 +32,17 @@ class NeverMatcherTests(unittest.TestCase):
         self.assertTrue(m("a/b/c/d/e/f/g/99/x"))
 
 
+class PatternMatcherTests(unittest.TestCase):
+    def testInvalidPatternAbortsEarly(self):
+        # Compilation is lazy, but invalid patterns must still abort when
+        # the matcher is built rather than on the first match.
+        kindpats = [("re", "a(", "")]
+        with self.assertRaises(error.Abort):
+            matchmod.patternmatcher("/", "", kindpats)
+        with self.assertRaises(error.Abort):
+            matchmod.includematcher("/", "", kindpats)
+
+
 class ExplainTreeMatcherTests(unittest.TestCase):
     def testExplain(self):
         m = matchmod.treematcher("/", "", rules=["foo/bar", "!baz", "qux", "!qux"])